@@ -15,6 +15,8 @@ class zulip::app_frontend_base {
   }
   # For Slack import
   zulip::safepackage { 'unzip': ensure => installed }
+  # For parallel compression of data export tarballs
+  zulip::safepackage { 'pigz': ensure => installed }
 
   file { '/etc/nginx/zulip-include/app':
     require => Package[$zulip::common::nginx],
@@ -104,6 +104,7 @@ COMMON_DEPENDENCIES = [
     "curl",  # Used for testing our API documentation
     "moreutils",  # Used for sponge command
     "unzip",  # Needed for Slack import
+    "pigz",  # Used to compress data export tarballs
     "crudini",  # Used for shell tooling w/ zulip.conf
     # Puppeteer dependencies from here
     "xdg-utils",
@@ -7,19 +7,26 @@
 # (2) if it doesn't belong in EXCLUDED_TABLES, add a Config object for
 # it to get_realm_config.
 import glob
+import gzip
+import io
 import logging
 import os
 import shutil
 import subprocess
+import tarfile
 import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
 from contextlib import suppress
 from datetime import datetime
 from functools import cache
-from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, TypedDict
+from typing import IO, Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, TypedDict
 
+import bmemcached
 import orjson
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import connection
 from django.db.models import Exists, OuterRef, Q
 from django.forms.models import model_to_dict
 from django.utils.timezone import is_naive as timezone_is_naive
@@ -97,6 +104,20 @@ class MessagePartial(TypedDict):
 
 MESSAGE_BATCH_CHUNK_SIZE = 1000
 
+# Rows fetched per round trip when we stream a large query through a
+# server-side cursor with QuerySet.iterator(), rather than having
+# Django materialize the entire result set in memory at once.
+QUERY_ITERATOR_CHUNK_SIZE = 2000
+
+# tarfile copies each member's contents into the archive 16KiB at a
+# time by default; uploads can be large, so use bigger chunks to cut
+# the number of read and write calls per file.
+EXPORT_TARBALL_COPY_BUFSIZE = 1024 * 1024
+
+# Below this many messages per UserMessage export process, the cost
+# of starting the process outweighs the parallelism it adds.
+MESSAGES_PER_EXPORT_THREAD = 200000
+
 ALL_ZULIP_TABLES = {
     "analytics_fillstate",
     "analytics_installationcount",
@@ -1212,13 +1233,25 @@ def fetch_usermessages(
         consented_user_ids = get_consented_user_ids(consent_message_id)
         user_profile_ids = user_profile_ids & consented_user_ids
     user_message_chunk = []
-    for user_message in user_message_query:
-        if user_message.user_profile_id not in user_profile_ids:
+    # A batch of messages in a busy stream can have millions of
+    # UserMessage rows, so we stream them rather than letting the
+    # QuerySet cache every row alongside the dicts we build.  We also
+    # fetch bare tuples, since constructing a model instance and
+    # running model_to_dict on it dominates the per-row cost.
+    user_message_rows = user_message_query.values_list(
+        "id", "user_profile_id", "message_id", "flags"
+    ).iterator(chunk_size=QUERY_ITERATOR_CHUNK_SIZE)
+    for user_message_id, user_profile_id, message_id, flags_mask in user_message_rows:
+        if user_profile_id not in user_profile_ids:
             continue
-        user_message_obj = model_to_dict(user_message)
-        user_message_obj["flags_mask"] = user_message.flags.mask
-        del user_message_obj["flags"]
-        user_message_chunk.append(user_message_obj)
+        user_message_chunk.append(
+            dict(
+                id=user_message_id,
+                user_profile=user_profile_id,
+                message=message_id,
+                flags_mask=flags_mask,
+            )
+        )
     logging.info("Fetched UserMessages for %s", message_filename)
     return user_message_chunk
 
@@ -1928,6 +1961,22 @@ def get_exportable_scheduled_message_ids(
     return set(ScheduledMessage.objects.filter(realm=realm).values_list("id", flat=True))
 
 
+def start_analytics_tables_export(realm: Realm, output_dir: Path) -> "Future[None]":  # nocoverage
+    # Don't share the database or memcached connections with the
+    # forked process; each side will reconnect as needed.
+    connection.close()
+    _cache = django_cache._cache  # type: ignore[attr-defined] # not in stubs
+    assert isinstance(_cache, bmemcached.Client)
+    _cache.disconnect_all()
+    executor = ProcessPoolExecutor(max_workers=1)
+    future = executor.submit(export_analytics_tables, realm=realm, output_dir=output_dir)
+    # The worker still runs the submitted job, and then exits, rather
+    # than waiting for more work; so it is cleaned up even if the rest
+    # of the export fails before anyone waits on the future.
+    executor.shutdown(wait=False)
+    return future
+
+
 def do_export_realm(
     realm: Realm,
     output_dir: Path,
@@ -1949,6 +1998,14 @@ def do_export_realm(
 
     create_soft_link(source=output_dir, in_progress=True)
 
+    # The analytics tables don't depend on anything else we export,
+    # and can be large (UserCount has a row per user, property and
+    # day), so when we have threads to spare we dump them from a
+    # separate process while this one exports everything else.
+    analytics_future: Optional[Future[None]] = None
+    if threads > 1:  # nocoverage
+        analytics_future = start_analytics_tables_export(realm=realm, output_dir=output_dir)
+
     exportable_scheduled_message_ids = get_exportable_scheduled_message_ids(
         realm, public_only, consent_message_id
     )
@@ -1997,7 +2054,10 @@ def do_export_realm(
     write_table_data(output_file=export_file, data=response)
 
     # Write analytics data
-    export_analytics_tables(realm=realm, output_dir=output_dir)
+    if analytics_future is None:
+        export_analytics_tables(realm=realm, output_dir=output_dir)
+    else:  # nocoverage
+        analytics_future.result()
 
     # zerver_attachment
     attachments = export_attachment_table(
@@ -2012,7 +2072,9 @@ def do_export_realm(
 
     # Start parallel jobs to export the UserMessage objects.
     launch_user_message_subprocesses(
-        threads=threads, output_dir=output_dir, consent_message_id=consent_message_id
+        threads=get_user_message_export_process_count(threads, message_count=len(message_ids)),
+        output_dir=output_dir,
+        consent_message_id=consent_message_id,
     )
 
     logging.info("Finished exporting %s", realm.string_id)
@@ -2021,17 +2083,75 @@ def do_export_realm(
     do_write_stats_file_for_realm_export(output_dir)
 
     tarball_path = output_dir.rstrip("/") + ".tar.gz"
-    subprocess.check_call(
-        [
-            "tar",
-            f"-czf{tarball_path}",
-            f"-C{os.path.dirname(output_dir)}",
-            os.path.basename(output_dir),
-        ]
-    )
+    with open(tarball_path, "wb") as tarball_file:
+        write_export_tarball(output_dir, tarball_file, threads=max(threads, 1))
     return tarball_path
 
 
+def write_export_tarball(
+    output_dir: Path, tarball_file: IO[bytes], threads: Optional[int] = None
+) -> None:
+    """Writes output_dir into tarball_file as a gzipped tar archive.
+
+    The archive is produced in stream mode: members are appended
+    in a single sequential pass, so tarball_file never needs to be
+    seekable and can be a pipe or an in-memory stream rather than a
+    file on disk.
+
+    As with `tar -z`, we compress at gzip's default level of 6 in a
+    separate process, which the tar stream is piped through.  For
+    large realms compression dominates the time spent building the
+    tarball, so we use pigz if it is installed, rather than gzip, to
+    compress on several cores.  pigz splits the stream into blocks,
+    compresses them on a pool of `threads` workers (all cores if
+    None), and writes the results back in order, so the caller's
+    --threads budget also bounds how many cores compression uses.
+    Its output is a standard gzip stream, so the result is the same
+    .tar.gz either way.
+    """
+    arcname = os.path.basename(output_dir)
+    compress_args: Optional[List[str]] = None
+    try:
+        tarball_fd = tarball_file.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        # In-memory streams have no descriptor for a compression
+        # process to write to.
+        pass
+    else:
+        pigz = shutil.which("pigz")
+        gzip_path = shutil.which("gzip")
+        if pigz is not None:
+            compress_args = [pigz, "-c"]
+            if threads is not None:
+                compress_args.append(f"--processes={threads}")
+        elif gzip_path is not None:
+            compress_args = [gzip_path, "-c"]
+
+    if compress_args is None:
+        # tarfile's own "w|gz" mode always compresses at level 9,
+        # which is several times slower than level 6 for a few
+        # percent smaller output.
+        with gzip.GzipFile(
+            fileobj=tarball_file, mode="wb", compresslevel=6
+        ) as gzip_file, tarfile.open(
+            fileobj=gzip_file, mode="w|", copybufsize=EXPORT_TARBALL_COPY_BUFSIZE
+        ) as tar:
+            tar.add(output_dir, arcname=arcname)
+        return
+
+    # The compression process writes straight to the descriptor,
+    # behind the back of any buffering in tarball_file.
+    tarball_file.flush()
+    with subprocess.Popen(compress_args, stdin=subprocess.PIPE, stdout=tarball_fd) as process:
+        assert process.stdin is not None
+        with process.stdin, tarfile.open(
+            fileobj=process.stdin, mode="w|", copybufsize=EXPORT_TARBALL_COPY_BUFSIZE
+        ) as tar:
+            tar.add(output_dir, arcname=arcname)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+
+
 def export_attachment_table(
     realm: Realm, output_dir: Path, message_ids: Set[int], scheduled_message_ids: Set[int]
 ) -> List[Attachment]:
@@ -2068,6 +2188,25 @@ def create_soft_link(source: Path, in_progress: bool = True) -> None:
         logging.info("See %s for output files", new_target)
 
 
+def get_user_message_export_process_count(threads: int, message_count: int) -> int:
+    # Each process claims whole messages-*.json.partial files, so
+    # don't start more of them than the exported messages keep busy,
+    # or than we have CPUs to run them on.
+    processes = min(
+        threads,
+        max(1, message_count // MESSAGES_PER_EXPORT_THREAD),
+        len(os.sched_getaffinity(0)),
+    )
+    if processes < threads:
+        logging.info(
+            "Using %d rather than %d processes to export UserMessage rows for %d messages",
+            processes,
+            threads,
+            message_count,
+        )
+    return processes
+
+
 def launch_user_message_subprocesses(
     threads: int, output_dir: Path, consent_message_id: Optional[int] = None
 ) -> None:
@@ -1,5 +1,6 @@
 import os
 import tempfile
+import time
 from argparse import ArgumentParser
 from typing import Any
 
@@ -82,7 +83,10 @@ class Command(ZulipBaseCommand):
         parser.add_argument(
             "--threads",
             default=settings.DEFAULT_DATA_EXPORT_IMPORT_PARALLELISM,
-            help="Threads to use in exporting UserMessage objects in parallel",
+            help=(
+                "Threads to use for exporting UserMessage objects and compressing the tarball;"
+                " small realms use fewer UserMessage export processes"
+            ),
         )
         parser.add_argument(
             "--public-only",
@@ -150,11 +154,10 @@ class Command(ZulipBaseCommand):
                 emoji_code="1f4e4",
                 reaction_type="unicode_emoji",
             )
-            for reaction in reactions:
-                if reaction.user_profile.realm != realm:
-                    raise CommandError(
-                        "Users from a different realm reacted to message. Aborting..."
-                    )
+            # Let the database stop at the first offending reaction,
+            # rather than loading every reacting user and their realm.
+            if reactions.exclude(user_profile__realm=realm).exists():
+                raise CommandError("Users from a different realm reacted to message. Aborting...")
 
             print(f"\n\033[94mMessage content:\033[0m\n{message.content}\n")
 
@@ -172,7 +175,7 @@ class Command(ZulipBaseCommand):
                 .count()
             )
             print(
-                f"\033[94mNumber of users that reacted outbox:\033[0m {len(reactions)} / {user_count} total non-guest users\n"
+                f"\033[94mNumber of users that reacted outbox:\033[0m {reactions.count()} / {user_count} total non-guest users\n"
             )
 
             proceed = input("Continue? [y/N] ")
@@ -183,18 +186,19 @@ class Command(ZulipBaseCommand):
             output_dir = tempfile.mkdtemp(prefix="zulip-export-")
         else:
             output_dir = os.path.realpath(os.path.expanduser(output_dir))
-            if os.path.exists(output_dir):
+            try:
+                os.makedirs(output_dir)
+            except FileExistsError:
                 if os.listdir(output_dir):
                     raise CommandError(
                         f"Refusing to overwrite nonempty directory: {output_dir}. Aborting...",
                     )
-            else:
-                os.makedirs(output_dir)
 
         tarball_path = output_dir.rstrip("/") + ".tar.gz"
         try:
-            with open(tarball_path, "x"):
-                pass
+            # Reserve the tarball path atomically; it is only readable
+            # by us, since it will contain the realm's private data.
+            os.close(os.open(tarball_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
         except FileExistsError:
             raise CommandError(
                 f"Refusing to overwrite existing tarball: {tarball_path}. Aborting..."
@@ -209,8 +213,17 @@ class Command(ZulipBaseCommand):
                 email_owners=False,
             )
 
+        # boto3 calls this for every chunk it sends, which for a large
+        # tarball is tens of thousands of times; print at most one
+        # progress dot per second, rather than one write per chunk.
+        last_progress_time = time.monotonic()
+
         def percent_callback(bytes_transferred: Any) -> None:
-            print(end=".", flush=True)
+            nonlocal last_progress_time
+            current_time = time.monotonic()
+            if current_time - last_progress_time >= 1:
+                last_progress_time = current_time
+                print(end=".", flush=True)
 
         RealmAuditLog.objects.create(
             acting_user=None,
@@ -1,5 +1,4 @@
 import os
-import subprocess
 import tempfile
 from argparse import ArgumentParser
 from typing import Any
@@ -7,7 +6,7 @@ from typing import Any
 from django.core.management.base import CommandError
 from typing_extensions import override
 
-from zerver.lib.export import do_export_user
+from zerver.lib.export import do_export_user, write_export_tarball
 from zerver.lib.management import ZulipBaseCommand
 
 
@@ -49,12 +48,6 @@ class Command(ZulipBaseCommand):
         do_export_user(user_profile, output_dir)
         print(f"Finished exporting to {output_dir}; tarring")
         tarball_path = output_dir.rstrip("/") + ".tar.gz"
-        subprocess.check_call(
-            [
-                "tar",
-                f"-czf{tarball_path}",
-                f"-C{os.path.dirname(output_dir)}",
-                os.path.basename(output_dir),
-            ]
-        )
+        with open(tarball_path, "wb") as tarball_file:
+            write_export_tarball(output_dir, tarball_file)
         print(f"Tarball written to {tarball_path}")
@@ -1,10 +1,14 @@
+import io
 import json
 import os
 import shutil
+import subprocess
+import tarfile
+import tempfile
 import uuid
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from typing import IO, Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from unittest.mock import patch
 
 import orjson
@@ -41,7 +45,15 @@ from zerver.lib import upload
 from zerver.lib.avatar_hash import user_avatar_path
 from zerver.lib.bot_config import set_bot_config
 from zerver.lib.bot_lib import StateHandler
-from zerver.lib.export import Record, do_export_realm, do_export_user, export_usermessages_batch
+from zerver.lib.export import (
+    MESSAGES_PER_EXPORT_THREAD,
+    Record,
+    do_export_realm,
+    do_export_user,
+    export_usermessages_batch,
+    get_user_message_export_process_count,
+    write_export_tarball,
+)
 from zerver.lib.import_realm import do_import_realm, get_incoming_message_ids
 from zerver.lib.streams import create_stream_if_needed
 from zerver.lib.test_classes import ZulipTestCase
@@ -358,6 +370,41 @@ class RealmImportExportTest(ExportFile):
         )
         self.export_realm(original_realm, exportable_user_ids, consent_message_id, public_only)
 
+    def test_user_message_export_process_count(self) -> None:
+        with patch("os.sched_getaffinity", return_value={0, 1, 2, 3}):
+            with self.assertNoLogs(level="INFO"):
+                self.assertEqual(
+                    get_user_message_export_process_count(
+                        2, message_count=10 * MESSAGES_PER_EXPORT_THREAD
+                    ),
+                    2,
+                )
+                # The test suite exports without any processes.
+                self.assertEqual(get_user_message_export_process_count(0, message_count=10), 0)
+
+            with self.assertLogs(level="INFO") as info_logs:
+                self.assertEqual(
+                    get_user_message_export_process_count(
+                        6, message_count=10 * MESSAGES_PER_EXPORT_THREAD
+                    ),
+                    4,
+                )
+                self.assertEqual(
+                    get_user_message_export_process_count(
+                        6, message_count=3 * MESSAGES_PER_EXPORT_THREAD - 1
+                    ),
+                    2,
+                )
+                self.assertEqual(get_user_message_export_process_count(6, message_count=10), 1)
+            self.assertEqual(
+                info_logs.output,
+                [
+                    "INFO:root:Using 4 rather than 6 processes to export UserMessage rows for 2000000 messages",
+                    "INFO:root:Using 2 rather than 6 processes to export UserMessage rows for 599999 messages",
+                    "INFO:root:Using 1 rather than 6 processes to export UserMessage rows for 10 messages",
+                ],
+            )
+
     def test_export_files_from_local(self) -> None:
         user = self.example_user("hamlet")
         realm = user.realm
@@ -2186,3 +2233,72 @@ class SingleUserExportTest(ExportFile):
                     Try to mostly keep checkers in alphabetical order.
                     """
                 )
+
+
+class ExportTarballTest(ZulipTestCase):
+    def make_export_tree(self) -> str:
+        output_dir = make_export_output_dir()
+        os.makedirs(os.path.join(output_dir, "uploads"))
+        with open(os.path.join(output_dir, "realm.json"), "wb") as f:
+            f.write(b'{"zerver_realm": []}')
+        with open(os.path.join(output_dir, "uploads", "file.txt"), "wb") as f:
+            f.write(b"zulip!")
+        return output_dir
+
+    def assert_export_tarball(self, tarball_file: IO[bytes]) -> None:
+        tarball_file.seek(0)
+        with tarfile.open(fileobj=tarball_file, mode="r:gz") as tar:
+            self.assertEqual(
+                sorted(tar.getnames()),
+                [
+                    "test-export",
+                    "test-export/realm.json",
+                    "test-export/uploads",
+                    "test-export/uploads/file.txt",
+                ],
+            )
+            member = tar.extractfile("test-export/uploads/file.txt")
+            assert member is not None
+            self.assertEqual(member.read(), b"zulip!")
+
+    def test_write_export_tarball_without_pigz(self) -> None:
+        output_dir = self.make_export_tree()
+        gzip = shutil.which("gzip")
+        assert gzip is not None
+
+        def which_without_pigz(cmd: str) -> Optional[str]:
+            return None if cmd == "pigz" else gzip
+
+        with tempfile.TemporaryFile() as tarball_file, patch(
+            "zerver.lib.export.shutil.which", side_effect=which_without_pigz
+        ), patch("zerver.lib.export.subprocess.Popen", wraps=subprocess.Popen) as mock_popen:
+            write_export_tarball(output_dir, tarball_file, threads=2)
+            self.assertEqual(mock_popen.call_args.args[0], [gzip, "-c"])
+            self.assert_export_tarball(tarball_file)
+
+        # Without any compression program, we compress in-process.
+        with tempfile.TemporaryFile() as tarball_file, patch(
+            "zerver.lib.export.shutil.which", return_value=None
+        ), patch("zerver.lib.export.subprocess.Popen") as mock_popen:
+            write_export_tarball(output_dir, tarball_file, threads=2)
+            mock_popen.assert_not_called()
+            self.assert_export_tarball(tarball_file)
+
+    def test_write_export_tarball_with_pigz(self) -> None:
+        output_dir = self.make_export_tree()
+        pigz = shutil.which("pigz")
+        assert pigz is not None
+        with tempfile.TemporaryFile() as tarball_file, patch(
+            "zerver.lib.export.subprocess.Popen", wraps=subprocess.Popen
+        ) as mock_popen:
+            write_export_tarball(output_dir, tarball_file, threads=2)
+            self.assertEqual(mock_popen.call_args.args[0], [pigz, "-c", "--processes=2"])
+            self.assert_export_tarball(tarball_file)
+
+        # In-memory streams have no file descriptor for pigz to write
+        # to, so they are compressed in-process even when it exists.
+        tarball_file = io.BytesIO()
+        with patch("zerver.lib.export.subprocess.Popen") as mock_popen:
+            write_export_tarball(output_dir, tarball_file, threads=2)
+        mock_popen.assert_not_called()
+        self.assert_export_tarball(tarball_file)